@@ -1,9 +1,31 @@
 """exlo initialization"""
 
+from importlib import import_module
 from importlib_metadata import version
 
-from .logging import Logger
-from .misc import User, Project, Component, Setup
-
 __author__ = "Olivier Vincent"
 __version__ = version("exlo")
+
+# Public classes are imported on first access (PEP 562), so that
+# `import exlo` does not read the json data/config files.
+_lazy_imports = {
+    'Logger': '.logging',
+    'User': '.misc',
+    'Project': '.misc',
+    'Component': '.misc',
+    'Setup': '.misc',
+}
+
+
+def __getattr__(name):
+    try:
+        module_name = _lazy_imports[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value  # next accesses do not go through __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_imports))
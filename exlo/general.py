@@ -4,10 +4,23 @@
 # Standard library imports
 from pathlib import Path
 import json
+import mmap
+import os
 
 # Non standard imports
 from tzlocal import get_localzone
 
+# Optional imports (faster json parsing / writing, streaming)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 # Log data and config
 import exlo_data
 DATA_FOLDER = Path(exlo_data.__file__).parent
@@ -24,6 +37,7 @@ class JsonData:
     category = None  # Category of data (e.g. 'user', 'project', etc.)
     file = None  # file (Path object) in which data is stored (define in subclass)
     all_data = {}  # Dict of data loaded from json file (define in subclass)
+    mmap_min_size = 64 * 1024  # json files larger than this (bytes) are mmapped
 
     def __init__(self, name):
         """Create object by getting attributes in json file"""
@@ -45,15 +59,70 @@ class JsonData:
     @staticmethod
     def _from_json(file):
         """Load python data (dict or list) from json file"""
-        with open(file, 'r', encoding='utf8') as f:
-            data = json.load(f)
+        if orjson is None:
+            with open(file, 'r', encoding='utf8') as f:
+                data = json.load(f)
+        else:
+            with open(file, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < JsonData.mmap_min_size:
+                    data = orjson.loads(f.read())
+                else:
+                    # parse directly from page cache, without full-size copy
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        with memoryview(mm) as buffer:
+                            data = orjson.loads(buffer)
         return data
 
+    @staticmethod
+    def _dumps(data):
+        """Convert python data (dict or list) into json-formatted bytes"""
+        if orjson is None:
+            return json.dumps(data, indent=4, ensure_ascii=False).encode('utf8')
+        else:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+
+    @staticmethod
+    def _dumps_list_item(item):
+        """Same as _dumps() but formatted as within a list, e.g. '\n    {...}'"""
+        chunk = JsonData._dumps([item])
+        return chunk[1:chunk.rindex(b']')].rstrip()
+
     @staticmethod
     def _to_json(file, data):
-        """Load python data (dict or list) from json file"""
-        with open(file, 'w', encoding='utf8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        """Save python data (dict or list) to json file.
+
+        Data is written to a temporary file first, which then replaces the
+        original file, so that the json file cannot be left half-written.
+        """
+        file = Path(file)
+        tmp_file = file.with_name(file.name + '.tmp')
+        with open(tmp_file, 'wb') as f:
+            f.write(JsonData._dumps(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, file)
+
+    @staticmethod
+    def _append_to_json(file, item):
+        """Append item to the list stored in a json file, without rewriting it.
+
+        The result is the same as saving the whole list with _to_json().
+        """
+        chunk = JsonData._dumps_list_item(item)
+
+        with open(file, 'r+b') as f:
+            size = f.seek(0, os.SEEK_END)
+            offset = max(0, size - 4096)
+            f.seek(offset)
+            tail = f.read()
+            # Everything before the closing bracket of the list
+            head = tail[:tail.rindex(b']')].rstrip()
+            separator = b'' if head.endswith(b'[') else b','
+            f.seek(offset + len(head))
+            f.write(separator + chunk + b'\n]')
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
 
     # ======================== Misc. private methods =========================
 
@@ -80,13 +149,40 @@ class JsonData:
 
         Used by change_name_to() methods;
         """
-        log_list = self._from_json(LOGS_FILE)  # list of dicts
+        if ijson is None:
+            log_list = self._from_json(LOGS_FILE)  # list of dicts
+            modified = False
+
+            for log_data in log_list:
+                if log_data[self.category] == self.name:
+                    log_data[self.category] = new_name
+                    modified = True
 
-        for log_data in log_list:
-            if log_data[self.category] == self.name:
-                log_data[self.category] = new_name
+            if modified:
+                self._to_json(LOGS_FILE, log_list)
 
-        self._to_json(LOGS_FILE, log_list)
+        else:
+            # Stream logs one by one into a temporary file (constant memory)
+            tmp_file = LOGS_FILE.with_name(LOGS_FILE.name + '.tmp')
+            modified = False
+
+            with open(LOGS_FILE, 'rb') as f_in, open(tmp_file, 'wb') as f_out:
+                f_out.write(b'[')
+                separator = b''
+                for log_data in ijson.items(f_in, 'item', use_float=True):
+                    if log_data[self.category] == self.name:
+                        log_data[self.category] = new_name
+                        modified = True
+                    f_out.write(separator + self._dumps_list_item(log_data))
+                    separator = b','
+                f_out.write(b'\n]' if separator else b']')
+                f_out.flush()
+                os.fsync(f_out.fileno())
+
+            if modified:
+                os.replace(tmp_file, LOGS_FILE)
+            else:
+                tmp_file.unlink()
 
     # ============================ Public methods ============================
 
@@ -130,12 +226,21 @@ PROJECTS_FILE = DATA_FOLDER / projects_filename
 COMPONENTS_FILE = DATA_FOLDER / components_filename
 SETUPS_FILE = DATA_FOLDER / setups_filename
 
-CONFIG = JsonData._from_json(CONFIG_FILE)
+_data_files = {
+    'config': CONFIG_FILE,
+    'users': USERS_FILE,
+    'projects': PROJECTS_FILE,
+    'components': COMPONENTS_FILE,
+    'setups': SETUPS_FILE,
+}
+_data = {name: JsonData._from_json(file) for name, file in _data_files.items()}
+
+CONFIG = _data['config']
 LOCAL_TIMEZONE = get_localzone()  # pytz object with local timezone info
 
-USERS = JsonData._from_json(USERS_FILE)
-PROJECTS = JsonData._from_json(PROJECTS_FILE)
-COMPONENTS = JsonData._from_json(COMPONENTS_FILE)
-SETUPS = JsonData._from_json(SETUPS_FILE)
+USERS = _data['users']
+PROJECTS = _data['projects']
+COMPONENTS = _data['components']
+SETUPS = _data['setups']
 
 LOGS_FILE = DATA_FOLDER / CONFIG['log file']
@@ -2,28 +2,106 @@
 
 
 # Standard library imports
-from datetime import datetime
-from dataclasses import dataclass
-from copy import copy
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import datetime, timedelta
+from dataclasses import dataclass, fields, replace
+from functools import lru_cache
+from operator import attrgetter, itemgetter
 from pathlib import Path
 
 # Non standard imports
 from dateutil.parser import parse
+import numpy as np
 import pandas as pd
 
+# Optional imports (streaming of json log file, fast ISO datetime parsing)
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import ciso8601
+except ImportError:
+    ciso8601 = None
+
 # Local imports
-from .general import CONFIG, LOCAL_TIMEZONE, LOGS_FILE, JsonData
-from .general import USERS, PROJECTS, COMPONENTS, SETUPS
+from .general import (CONFIG, LOCAL_TIMEZONE, LOGS_FILE, JsonData,
+                      USERS, PROJECTS, COMPONENTS, SETUPS)
 from .misc import Setup
 
 
+# ============================ Datetime parsing ==============================
+
+# Bound once to avoid lookups on every parse / format
+_DT_FMT = CONFIG["datetime format"]
+_LOCALIZE = LOCAL_TIMEZONE.localize
+
+# ISO 8601 storage formats (config), that can be parsed with ciso8601 instead
+# of strptime, and formatted without strftime: {format: (sep, seconds, tz)}
+_ISO_FORMATS = {f'%Y-%m-%d{sep}%H:%M{seconds}{tz}': (sep, bool(seconds), bool(tz))
+                for sep in ('T', ' ')
+                for seconds in ('', ':%S')
+                for tz in ('', '%z')}
+
+
+def _strptime_stored(datetime_str):
+    """Strict parsing of str in the storage format (config)."""
+    return datetime.strptime(datetime_str, _DT_FMT)
+
+
+# ciso8601 accepts any ISO 8601 str (not only _DT_FMT): only used for str
+# already stored in logs, not for user input (see Logger._parse_datetime)
+if ciso8601 is not None and _DT_FMT in _ISO_FORMATS:
+    _parse_stored = ciso8601.parse_datetime
+else:
+    _parse_stored = _strptime_stored
+
+if _DT_FMT in _ISO_FORMATS:
+    _SEP, _SECONDS, _TZ = _ISO_FORMATS[_DT_FMT]
+
+    def _format_stored(dt):
+        """Same as dt.strftime(_DT_FMT), but faster (no strftime/locale)"""
+        dt_str = (f'{dt.year:04d}-{dt.month:02d}-{dt.day:02d}'
+                  f'{_SEP}{dt.hour:02d}:{dt.minute:02d}')
+        if _SECONDS:
+            dt_str += f':{dt.second:02d}'
+        if _TZ:
+            offset = dt.utcoffset()
+            if offset is not None:
+                minutes, remainder = divmod(offset, timedelta(minutes=1))
+                if remainder:  # offsets with seconds (historical), rare
+                    return dt.strftime(_DT_FMT)
+                sign = '+' if minutes >= 0 else '-'
+                hours, minutes = divmod(abs(minutes), 60)
+                dt_str += f'{sign}{hours:02d}{minutes:02d}'
+        return dt_str
+else:
+    def _format_stored(dt):
+        return dt.strftime(_DT_FMT)
+
+
+@lru_cache(maxsize=1024)
+def _parse_logged_datetime(datetime_str: str) -> datetime:
+    """Convert str in the storage format (config) into datetime (cached)."""
+    return _parse_stored(datetime_str)
+
+
 # ================================ Log class =================================
 
+# Slots caching the datetimes of str fields, reset (None) when fields change
+_CACHED_DATETIMES = {'start': '_start_datetime', 'end': '_end_datetime'}
+
 
 @dataclass
 class Log:
     """Single log of equipment use."""
 
+    # No instance __dict__ (many logs in memory); last two slots cache datetimes
+    __slots__ = ('number', 'user', 'setup', 'project', 'start', 'end', 'note',
+                 '_start_datetime', '_end_datetime')
+
     number: int
     user: str
     setup: str
@@ -36,24 +114,84 @@ class Log:
         if self.end_datetime <= self.start_datetime:
             raise ValueError('End date must be later than start date.')
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in _CACHED_DATETIMES:
+            object.__setattr__(self, _CACHED_DATETIMES[name], None)
+
+    @classmethod
+    def _from_trusted(cls, values):
+        """Create log from field values (in order) known to be valid.
+
+        Used for logs loaded from the json file, which were checked when
+        created: __post_init__ is skipped and datetimes parsed only if needed.
+        """
+        log = object.__new__(cls)
+        for name, value in zip(_FIELD_NAMES, values):
+            object.__setattr__(log, name, value)
+        object.__setattr__(log, '_start_datetime', None)  # nothing cached yet
+        object.__setattr__(log, '_end_datetime', None)
+        return log
+
     @property
     def start_datetime(self):
-        """Convert self.start to a datetime.datetime"""
-        return datetime.strptime(self.start, CONFIG["datetime format"])
+        """Convert self.start to a datetime.datetime (computed once)"""
+        dt = self._start_datetime
+        if dt is None:
+            dt = self._start_datetime = _parse_logged_datetime(self.start)
+        return dt
 
     @property
     def end_datetime(self):
-        """Convert self.start to a datetime.datetime"""
-        return datetime.strptime(self.end, CONFIG["datetime format"])
+        """Convert self.end to a datetime.datetime (computed once)"""
+        dt = self._end_datetime
+        if dt is None:
+            dt = self._end_datetime = _parse_logged_datetime(self.end)
+        return dt
 
     @property
     def duration(self):
-        """Convert self.start to a datetime.datetime"""
+        """Time difference between end and start, as datetime.timedelta"""
         return self.end_datetime - self.start_datetime
 
 
+# Names of all Log fields, in order (i.e. positional arguments of Log())
+_FIELD_NAMES = tuple(field.name for field in fields(Log))
+
+
 # =============================== Logger class ===============================
 
+# Entries of a log that users can set through add() and update()
+_PARAMETER_NAMES = 'user', 'setup', 'project', 'start', 'end', 'note'
+
+# Values used in add() for entries that are not specified (from config)
+_DEFAULTS = {name: CONFIG[f'default {name}'] for name in _PARAMETER_NAMES}
+
+# Columns of the data sheets in Excel export
+_EXPORT_COLUMNS = (
+    'user',
+    'project',
+    'setup',
+    'start',
+    'end',
+    'duration',
+    'number',
+    'note',
+)
+
+# Durations are written in Excel as fractions of days, displayed as [h]:mm
+_DURATION_COLUMN = _EXPORT_COLUMNS.index('duration')
+_DURATION_FORMAT = {'num_format': '[h]:mm'}
+
+# Duration is computed afterwards, directly on the pandas columns
+_ROW_COLUMNS = tuple(col for col in _EXPORT_COLUMNS if col != 'duration')
+_COLUMN_GETTERS = tuple(attrgetter(column) for column in _ROW_COLUMNS)
+
+# Known column types (avoids type inference by pandas); start and end
+# are kept as str, as they are stored
+_DTYPES = {column: 'string' for column in _ROW_COLUMNS}
+_DTYPES['number'] = 'int64'
+
 
 class Logger:
     """General class to manage logs and their storage in .json files"""
@@ -71,7 +209,7 @@ class Logger:
         except FileNotFoundError:
             print('No log file detected. You can create one with the save() '
                   'method after adding logs.')
-            self.logs = {}
+            self.logs = []
 
     def __repr__(self):
         msg = f"Logger with {len(self.logs)} logs."
@@ -79,50 +217,81 @@ class Logger:
 
     # ------------------------ Misc. private methods -------------------------
 
-    def _add_default_values(self, **kwargs):
-        """Add default values to non-specified entries."""
-
-        names = 'user', 'setup', 'project', 'start', 'end', 'note'
-        params = {}
-
-        for ppty in names:
-            default_ppty = self.config[f'default {ppty}']
-            params[ppty] = kwargs.get(ppty, default_ppty)
-
-        return params
+    @staticmethod
+    def _log_data(log):
+        """Declared fields of log as dict (for json), without cached values"""
+        return {name: getattr(log, name) for name in _FIELD_NAMES}
 
     @staticmethod
     def _parse_datetime(datetime_str: str) -> datetime:
         """Transform loose str (e.g. '9am') into timezone-aware datetime"""
-        dt = parse(datetime_str, fuzzy=True, dayfirst=True)
-        dt_aware = LOCAL_TIMEZONE.localize(dt) if dt.tzinfo is None else dt
+        # Fast path for str already in the format used for storage (strict, so
+        # that other str are parsed the same way with or without ciso8601)
+        try:
+            dt = _strptime_stored(datetime_str)
+        except ValueError:
+            dt = parse(datetime_str, fuzzy=True, dayfirst=True)
+        dt_aware = _LOCALIZE(dt) if dt.tzinfo is None else dt
         return dt_aware
 
     @staticmethod
     def _format_datetime(dt_aware: datetime) -> str:
         """Format tz-aware datetime into correct str format for json saving etc."""
-        return dt_aware.strftime(CONFIG["datetime format"])
+        return _format_stored(dt_aware)
 
-    def _format_parameters(self, params):
-        """Format entries in user-input log by doing the following things:
+    def _format_parameter(self, name, value):
+        """Format single entry in user-input log by doing the following things:
 
         - Check that user, project and setup are documented in json files.
         - Format start and end dates to correct str format.
         """
-        if params['user'] not in self.users:
-            raise ValueError('Unknown user. Check users.json')
+        if name == 'user':
+            if value not in self.users:
+                raise ValueError('Unknown user. Check users.json')
+
+        elif name == 'setup':
+            if value not in self.setups:
+                raise ValueError('Undocumented setup. Check setups.json')
+
+        elif name == 'project':
+            if value not in self.projects:
+                raise ValueError('Unknown project. Check projects.json')
 
-        if params['setup'] not in self.setups:
-            raise ValueError('Undocumented setup. Check setups.json')
+        elif name in ('start', 'end'):
+            dt_aware = self._parse_datetime(value)
+            value = self._format_datetime(dt_aware)
 
-        if params['project'] not in self.projects:
-            raise ValueError('Unknown project. Check projects.json')
+        return value
 
-        for param in ('start', 'end'):
-            dt_str_in = params[param]
-            dt_aware = self._parse_datetime(dt_str_in)
-            dt_str_out = self._format_datetime(dt_aware)
-            params[param] = dt_str_out
+    def _format_parameters(self, params):
+        """Format (in place) all entries in user-input log, see above."""
+        for name, value in params.items():
+            params[name] = self._format_parameter(name, value)
+
+    def _build_log_params(self, kwargs):
+        """Add defaults to non-specified entries and format all in one pass."""
+        format_parameter = self._format_parameter
+        return {name: format_parameter(name, kwargs.get(name, default))
+                for name, default in _DEFAULTS.items()}
+
+    def _get_setup_components(self):
+        """(Known) components of every setup, as in json data at call time."""
+        setup_components = {}
+        for name in self.setups:
+            components = Setup(name).components
+            setup_components[name] = tuple(c for c in components
+                                           if c in self.components)
+        return setup_components
+
+    def _get_info_frames(self):
+        """Info sheets data for Excel export, as in json data at call time."""
+        info = {
+            '(Info) - Components': self.components,
+            '(Info) Setups': self.setups,
+            '(Info) Users': self.users,
+            '(Info) Projects': self.projects,
+        }
+        return {name: pd.DataFrame(data) for name, data in info.items()}
 
     # ---------------------------- Public methods ----------------------------
 
@@ -140,10 +309,9 @@ class Logger:
         When values are not specified, default values from the configuration
         file (config.json) are used.
         """
-        params = self._add_default_values(**kwargs)
-        self._format_parameters(params)
-        n = len(self.logs)
-        self.logs[n] = Log(number=n, **params)
+        params = self._build_log_params(kwargs)
+        log = Log(number=len(self.logs), **params)
+        self.logs.append(log)
 
     def remove(self, number=None):
         """Remove log from log list (by default, last one).
@@ -152,15 +320,15 @@ class Logger:
         all logs following it.
         """
         number = len(self.logs) - 1 if number is None else number
-        lastlog = True if number == len(self.logs) - 1 else False
+        number = range(len(self.logs))[number]  # IndexError if out of range
 
-        self.logs.pop(number)
+        del self.logs[number]
 
-        # Decrease ID number of following logs if necessary
-        if not lastlog:
-            for n in range(number + 1, len(self.logs) + 1):
-                self.logs[n - 1] = self.logs.pop(n)
-                self.logs[n - 1].number = n - 1
+        # Decrease ID number of following logs if necessary (number is not
+        # cached, so its slot is set directly, bypassing Log.__setattr__)
+        set_number = Log.number.__set__
+        for n in range(number, len(self.logs)):
+            set_number(self.logs[n], n)
 
     def update(self, number=None, **kwargs):
         """Update one or more entry in one of the logs (default last log).
@@ -169,27 +337,88 @@ class Logger:
         - kwargs can be any entry in a log (see logger.add()), except number.
         """
         n = len(self.logs) - 1 if number is None else number
+        n = range(len(self.logs))[n]  # IndexError if out of range
         log = self.logs[n]
 
-        params = copy(vars(log))
-        params.pop('number')
+        # Unchanged entries were already checked/formatted when log was created
+        params = dict(kwargs)
+        self._format_parameters(params)
 
-        for param, value in kwargs.items():
-            params[param] = value
+        self.logs[n] = replace(log, **params)  # new Log, end > start checked
 
-        self._format_parameters(params)
-        self.logs[n] = Log(number=n, **params)
+    def load(self, limit=None):
+        """Load logs stored in .json file into a list (ordered by number).
 
-    def load(self):
-        """Load logs stored in .json file into a dictionary."""
-        log_list = JsonData._from_json(LOGS_FILE)
-        return {log['number']: Log(**log) for log in log_list}
+        If limit is an int, only the last `limit` logs of the file are
+        returned, and Log objects are only created for these; if ijson is
+        installed, the file is streamed instead of being loaded in memory.
+        This is meant for inspection of recent logs: the logger itself
+        (self.logs) always holds all logs because save() rewrites the file.
+        """
+        if limit is None:
+            log_list = JsonData._from_json(LOGS_FILE)
+        elif ijson is None:
+            log_list = list(deque(JsonData._from_json(LOGS_FILE), maxlen=limit))
+        else:
+            with open(LOGS_FILE, 'rb') as f:
+                entries = ijson.items(f, 'item', use_float=True)
+                log_list = list(deque(entries, maxlen=limit))
+        log_list.sort(key=itemgetter('number'))
+        get_values = itemgetter(*_FIELD_NAMES)
+        return [Log._from_trusted(values) for values in map(get_values, log_list)]
 
     def save(self):
         """Save logs to json file."""
-        log_list = [vars(log) for log in self.logs.values()]
+        log_list = [self._log_data(log) for log in self.logs]
         JsonData._to_json(LOGS_FILE, log_list)
 
+    def append_save(self):
+        """Save last log by appending it to json file (faster than save()).
+
+        Only valid if the json file already contains all other logs, e.g.
+        right after save() or append_save() followed by one add(); use save()
+        in any other situation (several logs added, logs removed/updated).
+        """
+        if LOGS_FILE.exists():
+            JsonData._append_to_json(LOGS_FILE, self._log_data(self.logs[-1]))
+        else:
+            self.save()
+
+    def to_soa(self):
+        """Logs as a dict of numpy arrays, one per field (structure of arrays).
+
+        - 'number': int64
+        - 'user', 'setup', 'project': int32 indices of the names in
+          self.users, self.setups, self.projects (order of json files)
+        - 'start', 'end': datetime64[s] (UTC)
+        """
+        data = {'number': np.array([log.number for log in self.logs],
+                                   dtype=np.int64)}
+
+        for category, names in (('user', self.users),
+                                ('setup', self.setups),
+                                ('project', self.projects)):
+            index = {name: i for i, name in enumerate(names)}
+            data[category] = np.array([index[getattr(log, category)]
+                                       for log in self.logs], dtype=np.int32)
+
+        for ppty in ('start', 'end'):
+            timestamps = [int(getattr(log, f'{ppty}_datetime').timestamp())
+                          for log in self.logs]
+            timestamps = np.array(timestamps, dtype=np.int64)
+            data[ppty] = timestamps.astype('datetime64[s]')
+
+        return data
+
+    def durations_by_user(self):
+        """Total duration of logs for every user, as dict {user: timedelta}."""
+        data = self.to_soa()
+        seconds = (data['end'] - data['start']).astype(np.int64)
+        totals = np.bincount(data['user'], weights=seconds,
+                             minlength=len(self.users))
+        return {user: timedelta(seconds=float(total))
+                for user, total in zip(self.users, totals)}
+
     def to_excel(
         self,
         savepath='.',
@@ -210,61 +439,65 @@ class Logger:
         folder.mkdir(exist_ok=True)
         savefile = folder / filename
 
-        def filter_dates(data):
-            """return pandas data only within input min and max dates"""
-            if min_date is not None:
-                dt_end = pd.to_datetime(data['end'])
-                dt_min = self._parse_datetime(min_date)
-                data = data[dt_end >= dt_min]
-            if max_date is not None:
-                dt_start = pd.to_datetime(data['start'])
-                dt_max = self._parse_datetime(max_date)
-                data = data[dt_start <= dt_max]
-            return data
-
-        columns = (
-            'user',
-            'project',
-            'setup',
-            'start',
-            'end',
+        # Date limits, parsed once
+        min_dt = None if min_date is None else self._parse_datetime(min_date)
+        max_dt = None if max_date is None else self._parse_datetime(max_date)
+
+        # Built at every export, as setups/components can be renamed
+        setup_components = self._get_setup_components()
+
+        # Only logs on setups with (known) components are exported (selected
+        # on their current setup, which can be edited directly on the log)
+        exported_setups = {setup for setup, components
+                           in setup_components.items() if components}
+        setup_logs = (log for log in self.logs if log.setup in exported_setups)
+
+        # Logs sorted by start once (sheets are then already sorted), so that
+        # dates can be filtered by binary search before any data is collected
+        logs = sorted(setup_logs, key=attrgetter('start_datetime'))
+        starts = [log.start_datetime for log in logs]
+
+        if max_dt is not None:
+            logs = logs[:bisect_right(starts, max_dt)]
+
+        if min_dt is not None:
+            # logs starting after min_dt also end after it
+            i_min = bisect_left(starts, min_dt, hi=len(logs))
+            logs = [log for log in logs[:i_min]
+                    if log.end_datetime >= min_dt] + logs[i_min:]
+
+        # All logs in a single DataFrame, with duration computed vectorized
+        # (start and end converted to datetimes in utc only for this purpose)
+        logs_data = pd.DataFrame({
+            column: pd.array([get(log) for log in logs], dtype=_DTYPES[column])
+            for column, get in zip(_ROW_COLUMNS, _COLUMN_GETTERS)
+        })
+
+        start, end = (
+            pd.to_datetime(logs_data[ppty], format=_DT_FMT, utc=True)
+            for ppty in ('start', 'end')
+        )
+        logs_data.insert(
+            _DURATION_COLUMN,
             'duration',
-            'number',
-            'note',
+            (end - start) / pd.Timedelta(days=1),
         )
 
-        all_data = {}
-
-        for component in self.components:
-
-            data = {column: [] for column in columns}
-
-            for log in self.logs.values():
-
-                setup = Setup(log.setup)
+        # One row per (log, component), split by component (order preserved)
+        logs_data['component'] = logs_data['setup'].map(setup_components)
+        exploded_data = logs_data.explode('component')
+        component_groups = {component: group for component, group
+                            in exploded_data.groupby('component')}
+        no_data = exploded_data.iloc[:0]
 
-                if component in setup.components:
+        # xlsxwriter required for the write() calls on sheets below
+        with pd.ExcelWriter(savefile, engine='xlsxwriter') as writer:
 
-                    for column in columns:
-                        column_data = getattr(log, column)
-                        if column == 'duration':
-                            column_data = str(column_data)
-                        data[column].append(column_data)
+            duration_format = writer.book.add_format(_DURATION_FORMAT)
 
-            all_data[component] = data
+            for info_name, info_data in self._get_info_frames().items():
 
-        with pd.ExcelWriter(savefile, datetime_format='[h]:mm') as writer:
-
-            info = {
-                '(Info) - Components': self.components,
-                '(Info) Setups': self.setups,
-                '(Info) Users': self.users,
-                '(Info) Projects': self.projects,
-            }
-
-            for info_name, info_data in info.items():
-
-                pd.DataFrame(info_data).to_excel(
+                info_data.to_excel(
                     writer,
                     sheet_name=info_name,
                     startrow=2,
@@ -273,22 +506,28 @@ class Logger:
                 # Add title in first cell
                 writer.sheets[info_name].write(0, 0, info_name)
 
-            # hack to save datetimes correctly (see https://stackoverflow.com/
-            # questions/46523178/formatting-timedelta64-when-using-pandas-to-excel)
-            # t0 = pd.Timestamp('1900-01-01')
-
-            for component, data in all_data.items():
+            for component in self.components:
 
-                component_data = pd.DataFrame(data).sort_values('start')
-                component_data_final = filter_dates(component_data)
+                component_data = (
+                    component_groups.get(component, no_data)
+                    .drop(columns='component')
+                )
 
                 name = f'(Data) {component}'
-                component_data_final.to_excel(
+                component_data.to_excel(
                     writer,
                     sheet_name=name,
                     index=False,
                     startrow=2,
                 )
 
+                sheet = writer.sheets[name]
+                sheet.set_column(
+                    _DURATION_COLUMN,
+                    _DURATION_COLUMN,
+                    None,
+                    duration_format,
+                )
+
                 # Add title in first cell
-                writer.sheets[name].write(0, 0, name)
+                sheet.write(0, 0, name)
@@ -2,9 +2,8 @@
 
 
 # local imports
-from .general import JsonData, LOGS_FILE
-from .general import USERS, PROJECTS, COMPONENTS, SETUPS
-from .general import USERS_FILE, PROJECTS_FILE, COMPONENTS_FILE, SETUPS_FILE
+from .general import (JsonData, USERS, PROJECTS, COMPONENTS, SETUPS,
+                      USERS_FILE, PROJECTS_FILE, COMPONENTS_FILE, SETUPS_FILE)
 
 
 # ============================= General Classes ==============================
@@ -1,8 +1,71 @@
 """Tests for the exlo module."""
 
 # Standard library
-from exlo import Setup
-from exlo.general import SETUPS
+from datetime import datetime, timedelta
+import json
+
+# Non standard
+import openpyxl
+import pandas as pd
+import pytest
+
+# Local
+import exlo.general
+import exlo.logging
+from exlo import Logger, Setup, User
+from exlo.general import SETUPS, COMPONENTS, LOCAL_TIMEZONE
+
+
+# ================================= Helpers ==================================
+
+
+def _stored(*args):
+    """Datetime str in storage format, from datetime(*args) in local time."""
+    return Logger._format_datetime(LOCAL_TIMEZONE.localize(datetime(*args)))
+
+
+def _make_logger(n):
+    """Logger with n logs of durations 1h, 2h, ... alternating users."""
+    logger = Logger()
+    users = list(logger.users)
+    for i in range(n):
+        logger.add(user=users[i % len(users)],
+                   start=_stored(2023, 4, 1 + i, 10),
+                   end=_stored(2023, 4, 1 + i, 11 + i))
+    return logger
+
+
+def _exported_numbers(folder, component):
+    """Log numbers in data sheet of component, in Logs.xlsx (in folder)."""
+    sheet = pd.read_excel(folder / 'Logs.xlsx',
+                          sheet_name=f'(Data) {component}', header=2)
+    return sheet['number'].tolist()
+
+
+def _rename_component(monkeypatch, name, new_name):
+    """Same as Component(name).change_name_to(new_name), without json files."""
+    monkeypatch.setitem(COMPONENTS, new_name, COMPONENTS[name])
+    monkeypatch.delitem(COMPONENTS, name)
+    for setup_data in SETUPS.values():
+        components = [new_name if c == name else c
+                      for c in setup_data['components']]
+        monkeypatch.setitem(setup_data, 'components', components)
+
+
+@pytest.fixture(params=[False, True], ids=['std', 'fast'])
+def logs_file(request, tmp_path, monkeypatch):
+    """Temporary log file, with or without optional modules (if installed)."""
+    if not request.param:
+        monkeypatch.setattr(exlo.general, 'orjson', None)
+        monkeypatch.setattr(exlo.general, 'ijson', None)
+        monkeypatch.setattr(exlo.logging, 'ijson', None)
+    logs_file = tmp_path / 'logs.json'
+    monkeypatch.setattr(exlo.general, 'LOGS_FILE', logs_file)
+    monkeypatch.setattr(exlo.logging, 'LOGS_FILE', logs_file)
+    return logs_file
+
+
+# ================================== Tests ===================================
 
 
 def test_components():
@@ -10,3 +73,158 @@ def test_components():
     for setup_name in SETUPS:
         setup = Setup(setup_name)
         setup.check_components()
+
+
+def test_datetime_roundtrip():
+    """Check that datetime str in storage format are parsed consistently."""
+    # April 1st: read as January 4th if parsed with dayfirst (not fast path)
+    dt = LOCAL_TIMEZONE.localize(datetime(2023, 4, 1, 10))
+    dt_str = Logger._format_datetime(dt)
+    parsed_dt = Logger._parse_datetime(dt_str)
+    assert parsed_dt == dt
+    assert (parsed_dt.month, parsed_dt.day) == (4, 1)
+    assert Logger._format_datetime(parsed_dt) == dt_str
+
+
+def test_log_edit(logs_file):
+    """Check that datetimes of a log follow direct edits of start/end."""
+    logger = _make_logger(1)
+    log = logger.logs[0]
+    assert log.duration == timedelta(hours=1)
+    log.end = _stored(2023, 4, 1, 16)
+    assert log.duration == timedelta(hours=6)
+    log.start = _stored(2023, 4, 1, 15)
+    assert log.duration == timedelta(hours=1)
+    assert log.start_datetime.hour == 15
+
+
+def test_load_limit(logs_file):
+    """Check that load(limit) returns the last logs of the file."""
+    logger = _make_logger(5)
+    logger.save()
+    assert logger.load() == logger.logs
+    assert logger.load(limit=2) == logger.logs[-2:]
+    assert logger.load(limit=10) == logger.logs
+
+
+def test_append_save(logs_file):
+    """Check that append_save() writes the same file as save()."""
+    logger = _make_logger(2)
+    logger.append_save()  # no file yet -> save()
+    logger.add(start=_stored(2023, 5, 1, 9), end=_stored(2023, 5, 1, 10))
+    logger.append_save()
+    appended = logs_file.read_bytes()
+    logger.save()
+    assert logs_file.read_bytes() == appended
+    assert Logger().logs == logger.logs
+
+
+def test_to_soa_and_durations(logs_file):
+    """Check arrays of to_soa() and totals of durations_by_user()."""
+    logger = _make_logger(3)
+    users = list(logger.users)
+    data = logger.to_soa()
+
+    assert data['number'].tolist() == [0, 1, 2]
+    assert data['user'].tolist() == [users.index(log.user)
+                                     for log in logger.logs]
+    durations = (data['end'] - data['start']).astype('timedelta64[h]')
+    assert durations.astype(int).tolist() == [1, 2, 3]
+
+    expected = {user: timedelta(0) for user in users}
+    for log in logger.logs:
+        expected[log.user] += log.duration
+    assert logger.durations_by_user() == expected
+
+
+def test_update_logs(logs_file):
+    """Check renaming of users in log file, and no rewrite if no match."""
+    logger = _make_logger(3)
+    logger.save()
+    old_name, other_name = list(logger.users)[:2]
+
+    User(old_name)._update_logs('Someone')
+    users = [log_data['user'] for log_data in json.loads(logs_file.read_text())]
+    assert users == ['Someone', other_name, 'Someone']
+
+    # No more log with old name: file must not be written again
+    content = logs_file.read_bytes()
+    mtime = logs_file.stat().st_mtime_ns
+    User(old_name)._update_logs('Someone')
+    assert logs_file.read_bytes() == content
+    assert logs_file.stat().st_mtime_ns == mtime
+    assert list(logs_file.parent.iterdir()) == [logs_file]  # no tmp file
+
+
+def test_to_excel(logs_file, tmp_path):
+    """Check data sheets of Excel export: rows, order, durations, dates."""
+    logger = Logger()
+    logger.add(start=_stored(2023, 4, 3, 10), end=_stored(2023, 4, 3, 12))
+    logger.add(start=_stored(2023, 4, 1, 10), end=_stored(2023, 4, 2, 12))
+    logger.add(setup='Optic2',
+               start=_stored(2023, 4, 5, 9), end=_stored(2023, 4, 5, 10))
+    logger.to_excel(tmp_path)
+
+    sheet = pd.read_excel(tmp_path / 'Logs.xlsx',
+                          sheet_name='(Data) Microscope', header=2)
+    assert sheet.columns.tolist() == ['user', 'project', 'setup', 'start',
+                                      'end', 'duration', 'number', 'note']
+    assert sheet['number'].tolist() == [1, 0, 2]  # sorted by start
+    assert sheet['setup'].tolist() == ['Optic1', 'Optic1', 'Optic2']
+    assert sheet['start'].tolist() == [logger.logs[n].start
+                                       for n in (1, 0, 2)]
+
+    # Durations as fractions of days, displayed as [h]:mm (also > 24h)
+    workbook = openpyxl.load_workbook(tmp_path / 'Logs.xlsx')
+    worksheet = workbook['(Data) Microscope']
+    assert worksheet['A1'].value == '(Data) Microscope'
+    durations = [cell for cell, in worksheet.iter_rows(min_row=4, min_col=6,
+                                                       max_col=6)]
+    assert [cell.number_format for cell in durations] == ['[h]:mm'] * 3
+    assert [cell.value for cell in durations] == [timedelta(hours=26),
+                                                  timedelta(hours=2),
+                                                  timedelta(hours=1)]
+
+    assert _exported_numbers(tmp_path, 'Laser') == [1, 0]
+    assert _exported_numbers(tmp_path, 'Camera') == []  # not in any setup
+
+    # Log 1 starts before min_date but ends after it
+    logger.to_excel(tmp_path, min_date=_stored(2023, 4, 2, 11))
+    assert _exported_numbers(tmp_path, 'Microscope') == [1, 0, 2]
+    logger.to_excel(tmp_path, min_date=_stored(2023, 4, 2, 13))
+    assert _exported_numbers(tmp_path, 'Microscope') == [0, 2]
+
+    # Logs starting at max_date are included
+    logger.to_excel(tmp_path, max_date=_stored(2023, 4, 3, 10))
+    assert _exported_numbers(tmp_path, 'Microscope') == [1, 0]
+    logger.to_excel(tmp_path, min_date=_stored(2023, 4, 2, 13),
+                    max_date=_stored(2023, 4, 4, 0))
+    assert _exported_numbers(tmp_path, 'Microscope') == [0]
+
+
+def test_export_after_edits(logs_file, tmp_path):
+    """Check that exported logs follow add/update/remove and direct edits."""
+    logger = _make_logger(4)  # default setup Optic1 (Laser, Microscope)
+    logger.update(1, setup='Optic2')  # Optic2: Microscope only
+    logger.logs[0].setup = 'Optic2'
+    logger.remove(0)
+    logger.logs[1].setup = 'Optic2'
+    logger.add(start=_stored(2023, 5, 1, 9), end=_stored(2023, 5, 1, 10))
+
+    logger.to_excel(tmp_path)
+    assert _exported_numbers(tmp_path, 'Laser') == [2, 3]
+    assert _exported_numbers(tmp_path, 'Microscope') == [0, 1, 2, 3]
+
+
+def test_export_after_rename(logs_file, tmp_path, monkeypatch):
+    """Check that exports use the current names of components."""
+    logger = _make_logger(2)
+    logger.to_excel(tmp_path)
+    _rename_component(monkeypatch, 'Laser', 'Laser2')
+    logger.to_excel(tmp_path)
+    assert _exported_numbers(tmp_path, 'Laser2') == [0, 1]
+
+    components = pd.read_excel(tmp_path / 'Logs.xlsx',
+                               sheet_name='(Info) - Components', header=2)
+    assert 'Laser2' in components.columns
+    assert 'Laser' not in components.columns